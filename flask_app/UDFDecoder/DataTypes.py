@@ -4,7 +4,7 @@ import pyarrow as pa
 class DataType:
     """A Class that is used to convert dataTypes from different libraries."""
 
-    def __init__(self, udf_type: str, struct_lib_type: str, pyarrow_type: pa.DataType, length : int) -> None:
+    def __init__(self, udf_type: str, struct_lib_type: str, pyarrow_type: pa.DataType, length : int, numpy_type: str) -> None:
         """Initalise a DataType.
 
         Args:
@@ -12,11 +12,13 @@ class DataType:
             struct_lib_type (str): Type in the struct Library
             pyarrow_type (pa.DataType): Type in the pyarrow Library
             length (int): Length of the datatype
+            numpy_type (str): Type in the numpy Library
         """
         self._UDFType = udf_type
         self._structLibType = struct_lib_type
         self.pyarrowType = pyarrow_type
         self.length = length
+        self._numpyType = numpy_type
 
     def get_udf_type(self) -> str:
         """Get the UDF Type of the DataType Object.
@@ -50,44 +52,41 @@ class DataType:
         """
         return self.length
 
+    def get_numpy_type(self) -> str:
+        """Get the numpy Type of the DataType Object.
+
+        Returns:
+            str: The string of how this DataType is noted in the numpy library
+        """
+        return self._numpyType
+
 
 data_types = []
-data_types.append(DataType("s8", "b", pa.int8(), 1))
-data_types.append(DataType("u8", "B", pa.uint8(), 1))
-data_types.append(DataType("s16", "h", pa.int16(), 2))
-data_types.append(DataType("u16", "H", pa.uint16(), 2))
-data_types.append(DataType("s32", "i", pa.int32(), 4))
-data_types.append(DataType("u24", "I", pa.uint32(), 3))
-data_types.append(DataType("u32", "I", pa.uint32(), 4))
-data_types.append(DataType("s64", "q", pa.int64(), 8))
-data_types.append(DataType("u64", "Q", pa.uint64(), 8))
-data_types.append(DataType("f", "f", pa.float32(), 4))
-data_types.append(DataType("d", "d", pa.float64(), 8))
-data_types.append(DataType("s", "s", pa.string(), 16))
-data_types.append(DataType("st", "s", pa.string(), 16))
-# data_types.append(DataType("", "?", pa.bool_()))
-
-def dt_get_pyarrow_type(udf_type: str) -> pa.DataType:
-    for data_type in data_types:
-            if data_type.get_udf_type() == udf_type:
-                return data_type.get_pyarrow_type()
+data_types.append(DataType("s8", "b", pa.int8(), 1, "<i1"))
+data_types.append(DataType("u8", "B", pa.uint8(), 1, "<u1"))
+data_types.append(DataType("s16", "h", pa.int16(), 2, "<i2"))
+data_types.append(DataType("u16", "H", pa.uint16(), 2, "<u2"))
+data_types.append(DataType("s32", "i", pa.int32(), 4, "<i4"))
+data_types.append(DataType("u24", "I", pa.uint32(), 3, "<u4"))
+data_types.append(DataType("u32", "I", pa.uint32(), 4, "<u4"))
+data_types.append(DataType("s64", "q", pa.int64(), 8, "<i8"))
+data_types.append(DataType("u64", "Q", pa.uint64(), 8, "<u8"))
+data_types.append(DataType("f", "f", pa.float32(), 4, "<f4"))
+data_types.append(DataType("d", "d", pa.float64(), 8, "<f8"))
+data_types.append(DataType("s", "s", pa.string(), 16, "S16"))
+data_types.append(DataType("st", "s", pa.string(), 16, "S16"))
+data_types.append(DataType("", "?", pa.bool_(), 0, "?")) # event only axis without a value, it is True for every event
+
+udf_to_struct = {data_type.get_udf_type(): data_type.get_structlib_type() for data_type in data_types}
+udf_to_pyarrow = {data_type.get_udf_type(): data_type.get_pyarrow_type() for data_type in data_types}
+udf_to_length = {data_type.get_udf_type(): data_type.get_length() for data_type in data_types}
+udf_to_numpy = {data_type.get_udf_type(): data_type.get_numpy_type() for data_type in data_types}
+
+dt_get_pyarrow_type = udf_to_pyarrow.get
+dt_get_numpy_type = udf_to_numpy.get
 
 def dt_get_structlib_type(udf_type: str) -> str:
-    temp = ""
-    for data_type in data_types:
-            if data_type.get_udf_type() == udf_type:
-                temp = data_type.get_structlib_type()
-                break
-    return temp
+    return udf_to_struct.get(udf_type, "")
 
 def dt_get_udf_length(udf_type: str) -> int:
-    length = 0
-    for data_type in data_types:
-            if data_type.get_udf_type() == udf_type:
-                length = data_type.get_length()
-                break
-    return length
-
-    # length = [0]
-    # length = [data_type.get_length() for data_type in data_types if data_type.get_udf_type() == udf_type]
-    # return length[0]
\ No newline at end of file
+    return udf_to_length.get(udf_type, 0)
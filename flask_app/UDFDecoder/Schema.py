@@ -1,5 +1,7 @@
 """Schema."""
-from .DataTypes import data_types
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from .DataTypes import dt_get_structlib_type, dt_get_pyarrow_type, dt_get_numpy_type
 
 class Schema:
     """Class that saves the data from one axis of one sensor from a UDF-File."""
@@ -16,35 +18,99 @@ class Schema:
         self._dataType = data_type
         self._axisName = axis_name
         self._scalingFactor = scaling_factor
-        self._values = {}
-        self._timeStampIndices = {}
+        self._values = [np.empty(0, dtype=dt_get_numpy_type(data)) for data in data_type]
+        self._timeStampIndices = np.empty(0, dtype=np.int64)
         self._samplingRate = sampling_rate
         self._properties = properties
+        self._recordDtype = self.__make_record_dtype()
+        self._decode = self.__make_decoder()
 
+    def __make_record_dtype(self) -> np.dtype:
+        """Create the structured numpy dtype of one event of this schema.
 
-    def add_value(self, key, value) -> None:
-        """Add one value to the objects list of values.
+        Axes whose numpy type is wider than their UDF type (u24) are kept as raw bytes. Axes without a value (event only schemata) have no field.
+
+        Returns:
+            np.dtype: the structured dtype with one field per axis
+        """
+        names = []
+        formats = []
+        offsets = []
+        offset = 0
+        for idx, (data, size) in enumerate(zip(self._dataType, self._sizeInBytes)):
+            if size > 0:
+                numpy_type = np.dtype(dt_get_numpy_type(data))
+                names.append(str(idx))
+                formats.append(numpy_type if numpy_type.itemsize == size else np.dtype((np.uint8, size)))
+                offsets.append(offset)
+            offset += size
+        return np.dtype({"names": names, "formats": formats, "offsets": offsets, "itemsize": offset})
+
+
+    def __make_decoder(self):
+        """Create the function that decodes all events of this schema at once.
+
+        Everything that only depends on the layout of the schema is evaluated here once instead of on every read.
+
+        Returns:
+            function: decodes the events starting at the given offsets of a uint8 buffer into one array per axis
+        """
+        record_dtype = self._recordDtype
+        axes = []
+        for idx, (data, size) in enumerate(zip(self._dataType, self._sizeInBytes)):
+            numpy_type = np.dtype(dt_get_numpy_type(data))
+            axes.append((str(idx), numpy_type if numpy_type.itemsize != size else None, size))
+
+        def decode(buffer: np.ndarray, offsets: np.ndarray) -> list:
+            if record_dtype.itemsize > 0:
+                events = sliding_window_view(buffer, record_dtype.itemsize) # one row per possible event start, without copying the buffer
+                records = events[offsets].view(record_dtype).reshape(-1)
+            columns = []
+            for name, widened_type, size in axes:
+                if size == 0: # an axis without a value only notes that the event occurred
+                    columns.append(np.ones(len(offsets), dtype=bool))
+                    continue
+                column = records[name]
+                if widened_type is not None: # u24 datatypes are widened with a zero MSB
+                    widened = np.zeros((len(column), widened_type.itemsize), dtype=np.uint8)
+                    widened[:, :size] = column
+                    column = widened.view(widened_type).reshape(-1)
+                if column.dtype.kind == "S": # strings lose their NUL padding and are decoded like labels, tolist() already strips the trailing NULs
+                    column = np.array([value.decode("UTF-8", errors="replace") for value in column.tolist()], dtype=object)
+                columns.append(np.ascontiguousarray(column))
+            return columns
+
+        return decode
+
+    def decode_events(self, buffer: np.ndarray, offsets: np.ndarray) -> list:
+        """Decode all events of this schema at once.
+
+        The bytes of every event are gathered into one contiguous block by a single row lookup, which is then viewed as the record dtype, so every axis is read with a single buffer cast.
 
         Args:
-            value (any): Value to add to the list
+            buffer (np.ndarray): The binary file as an array of uint8
+            offsets (np.ndarray): The indices of the first byte after the schema index of every event
+
+        Returns:
+            list: one array of values for every axis
         """
-        # self._values.append(value)
-        self._values.setdefault(key, []).append(value)
+        return self._decode(buffer, offsets)
 
-    def add_timestamp_index(self, key, time_stamp_index: int) -> None:
-        """Add one index of one timestamp to the list of the indices of timestamps.
+    def set_values(self, values: list, time_stamp_indices: np.ndarray) -> None:
+        """Set the values of all axes and the indices of their timestamps.
 
         Args:
-            time_stamp_index (int): Index to add to the list
+            values (list[np.ndarray]): One array of values for every axis
+            time_stamp_indices (np.ndarray): Indices of the timestamps belonging to the events, shared by all axes
         """
-        # self._timeStampIndices.append(time_stamp_index)
-        self._timeStampIndices.setdefault(key, []).append(time_stamp_index)
+        self._values = values
+        self._timeStampIndices = time_stamp_indices
 
-    def get_values(self) -> dict:
-        """Get the list of the values.
+    def get_values(self) -> list:
+        """Get the arrays of the values.
 
         Returns:
-            list: the list of values
+            list: one array of values for every axis
         """
         return self._values
 
@@ -80,6 +146,14 @@ class Schema:
         """
         return int(self._eventSize)
 
+    def get_record_dtype(self) -> np.dtype:
+        """Get the structured numpy dtype of one event.
+
+        Returns:
+            np.dtype: the structured dtype with one field per axis
+        """
+        return self._recordDtype
+
     def get_axis_name(self) -> str:
         """Get the name of the axis of the schema.
 
@@ -112,43 +186,39 @@ class Schema:
         """
         return self._samplingRate
 
-    def get_timestamp_indices(self) -> dict: ###
+    def get_timestamp_indices(self) -> np.ndarray:
         """Get the Indices of the timestamps.
 
         Returns:
-            list: the list of timestamp indices
+            np.ndarray: the array of timestamp indices
         """
         return self._timeStampIndices
 
     def get_amount_of_values(self) -> int:
         """Get the amount of the values saved.
 
-        Uses the len() function on the list of values to get the amount.
+        Uses the len() function on the array of timestamp indices to get the amount of events.
 
         Returns:
-            int: _description_
+            int: the amount of events of every axis
         """
-        return len(self._values)
+        return len(self._timeStampIndices)
 
-    def get_datatype_for_struct_lib(self) -> str:
-        """Get the correlating datatype of the struct library to the schema's UDF datatype.
+    def get_datatype_for_struct_lib(self) -> list:
+        """Get the correlating datatypes of the struct library to the schema's UDF datatypes.
 
         Returns:
-            str: struct datatype
+            list: struct datatype of every axis
         """
-        for data_type in data_types:
-            if data_type.get_udf_type() == self._dataType: ##changes 
-                return data_type.get_structlib_type()
+        return [dt_get_structlib_type(data_type) for data_type in self._dataType]
 
-    def get_datatype_for_pyarrow_lib(self):
-        """Get the correlating datatype of the pyarrow library to the schema's UDF datatype.
+    def get_datatype_for_pyarrow_lib(self) -> list:
+        """Get the correlating datatypes of the pyarrow library to the schema's UDF datatypes.
 
         Returns:
-            _type_: _description_
+            list: pyarrow datatype of every axis
         """
-        for data_type in data_types:
-            if data_type.get_udf_type() == self._dataType:
-                return data_type.get_pyarrow_type()
+        return [dt_get_pyarrow_type(data_type) for data_type in self._dataType]
 
     def __str__(self) -> str:
         """Print this Class out in a readable way.
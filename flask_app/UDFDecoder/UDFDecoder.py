@@ -1,44 +1,150 @@
 """UDFDecoder."""
 
 from .Schema import Schema
-from .DataTypes import dt_get_udf_length, dt_get_structlib_type, dt_get_pyarrow_type
-import struct
+from .DataTypes import dt_get_udf_length, dt_get_pyarrow_type
+import contextlib
+import functools
+import itertools
+import mmap
+import os
 import pathlib
 import typing
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 import time
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 import pyarrow as pa
+import pyarrow.compute as pc
 import pyarrow.parquet as pq
 import pyarrow.csv as csv
 
+try:
+    from numba import njit, types
+except ImportError: # numba is optional, the body is scanned by the interpreter without it
+    njit = None
+
+NANOSECONDS_PER_UNIT = {"s": 1e9, "ms": 1e6, "us": 1e3}
+
+BATCH_ROWS = 1 << 16
+PARQUET_ROW_GROUP_ROWS = 1 << 20
+
+RECORD_INVALID = 0
+RECORD_TIMESTAMP = 1
+RECORD_LABEL = 2
+RECORD_EVENT = 3
+
 pyarrowSchema = typing.TypeVar("pyarrowSchema")
 pyarrowTable = typing.TypeVar("pyarrowTable")
 
 
+def _scan_body(buffer, cursor, record_kinds, record_sizes, count_only, timestamp_offsets, label_offsets, event_offsets, event_indices, event_timestamp_indices):
+    """Walk the records of a UDF body and note where every timestamp, label and event starts.
+
+    The outputs have to be preallocated large enough to hold every record, a walk with count_only returns the amount of records without touching the outputs. The walk stops at the first record that is unknown or does not fit into the buffer.
+
+    Args:
+        buffer (np.ndarray): The binary file as an array of uint8.
+        cursor (int): The index of the first byte of the body.
+        record_kinds (np.ndarray): The kind of record (RECORD_*) that starts with a byte, indexed by that byte.
+        record_sizes (np.ndarray): The size of the record including its first byte, indexed by that byte.
+        count_only (bool): Only count the records, the outputs may be empty.
+        timestamp_offsets (np.ndarray): Output for the index of every timestamp.
+        label_offsets (np.ndarray): Output for the index of every label.
+        event_offsets (np.ndarray): Output for the index of the first byte after the schema index of every event.
+        event_indices (np.ndarray): Output for the schema index of every event.
+        event_timestamp_indices (np.ndarray): Output for the index of the timestamp of every event.
+
+    Returns:
+        tuple[int, int, int, int]: The cursor where the walk stopped and the amount of timestamps, labels and events.
+    """
+    timestamp_count = 0
+    label_count = 0
+    event_count = 0
+    length = len(buffer)
+    while cursor < length:
+        tag = buffer[cursor]
+        kind = record_kinds[tag]
+        if kind == RECORD_INVALID or cursor + record_sizes[tag] > length:
+            break
+        if kind == RECORD_EVENT:
+            if not count_only:
+                event_offsets[event_count] = cursor + 1
+                event_indices[event_count] = tag
+                event_timestamp_indices[event_count] = timestamp_count - 1
+            event_count += 1
+        elif kind == RECORD_TIMESTAMP:
+            if not count_only:
+                timestamp_offsets[timestamp_count] = cursor + 1
+            timestamp_count += 1
+        else:
+            if not count_only:
+                label_offsets[label_count] = cursor + 1
+            label_count += 1
+        cursor += record_sizes[tag]
+    return cursor, timestamp_count, label_count, event_count
+
+
+if njit is not None: # compiled eagerly for the only signature it is called with, so the cached machine code is loaded on import and not on the first file
+    _bytes = types.Array(types.uint8, 1, "C")
+    _indices = types.Array(types.int64, 1, "C")
+    _scan_body_signature = types.UniTuple(types.int64, 4)(types.Array(types.uint8, 1, "C", readonly=True), types.int64, _bytes, _indices, types.boolean, _indices, _indices, _indices, _bytes, _indices)
+    _scan_body = njit(_scan_body_signature, cache=True, boundscheck=False)(_scan_body)
+
+
+def _is_scalable(pyarrow_type: pa.DataType) -> bool:
+    """Check if the values of a column can be scaled, labels, strings and event only axes keep their values.
+
+    Args:
+        pyarrow_type (pa.DataType): The pyarrow type of the column.
+
+    Returns:
+        bool: True for integer and floating point columns.
+    """
+    return pa.types.is_integer(pyarrow_type) or pa.types.is_floating(pyarrow_type)
+
+
+@functools.lru_cache(maxsize=4096)
+def _make_field(name: str, udf_type: str, scaling_factor: str) -> pa.Field:
+    """Create the pyarrow.field of one axis.
+
+    pyarrow.field objects are immutable, so they are cached and shared between all files with the same schemata.
+
+    Args:
+        name (str): The name of the column.
+        udf_type (str): The UDF datatype of the axis.
+        scaling_factor (str): The scaling factor of the axis, saved in the metadata of the field.
+
+    Returns:
+        pa.Field: The pyarrow.field of the axis.
+    """
+    return pa.lib.field(name, dt_get_pyarrow_type(udf_type), metadata={"scaling_factor": scaling_factor})
+
+
 class UDFDecoder:
     """Class for reading binary files in the UDF Format.
 
     Defined at https://inside-docupedia.bosch.com/confluence/pages/viewpage.action?pageId=2282018346.
     """
 
-    def __init__(self, debug_mode: bool = False) -> None:
+    def __init__(self, debug_mode: bool = False, time_format: str = "ns") -> None:
         """Initialise a object of the UDFDecoder class.
 
         Args:
-            time_format (str): String defining the time_format. Can only be one of the following: 'ns'. Defaults to "ns".
             debug_mode (bool): Activates debug messages. Defaults to False.
+            time_format (str): String defining the time_format. Can only be one of the following: 's', 'ms', 'us', 'ns'. Defaults to "ns".
 
         Raises:
             ValueError: If the TimeFormat is not supported
             TypeError: If the TimeFormat is not a string
             TypeError: If the debug_mode is not a string
         """
-        # if ["s", "ms", "us", "ns"].count(time_format) > 0:
-        self._TimeFormat = "ns"
-        # else:
-        #     if type(time_format) == str:
-        #         raise ValueError(f"TimeFormat '{time_format}' is not supported")
-        #     raise TypeError(f"Argument TimeFormat '{time_format}' in constructor must be a string. It is of type {type(time_format)}")
+        if ["s", "ms", "us", "ns"].count(time_format) > 0:
+            self._TimeFormat = time_format
+        else:
+            if type(time_format) == str:
+                raise ValueError(f"TimeFormat '{time_format}' is not supported")
+            raise TypeError(f"Argument TimeFormat '{time_format}' in constructor must be a string. It is of type {type(time_format)}")
 
         if type(debug_mode) == bool:
             self._DebugMode = debug_mode
@@ -62,6 +168,8 @@ class UDFDecoder:
     def __header_from_byte_array(self, file_blob: bytearray) -> tuple[dict, int]:
         """Read the schemata from a UDF file header.
 
+        The header is split as bytes and only the fields that are kept as text are decoded, numbers are parsed from the bytes directly.
+
         Args:
             file_blob (bytearray): A bytearray that is only the header of a binary file in the UDF format.
 
@@ -69,26 +177,28 @@ class UDFDecoder:
             tuple[list, int]: A list of the schemata that are defined in the header and a cursor that is the Index of the first byte in the binary file after the header.
         """
         schemata = {}
-        variable_header = file_blob.decode("UTF-8").split("\r\n")
-        self._Version = variable_header.pop(0)
+        variable_header = file_blob.split(b"\r\n")
+        self._Version = variable_header.pop(0).decode("UTF-8")
         if self._Version == "1.0":
             for schema in variable_header:
-                vals = schema.split(":")
-                event_size = vals[2].strip()
-                axis_names = [axis.strip() for axis in vals[4].split(",")]
-                data_types = [data.strip() for data in vals[3].split(",")]
+                vals = schema.split(b":")
+                event_size = vals[2].strip().decode("UTF-8")
+                axis_names = [axis.strip() for axis in vals[4].decode("UTF-8").split(",")]
+                data_types = [data.strip() for data in vals[3].decode("UTF-8").split(",")]
                 size = [dt_get_udf_length(data) for data in data_types]
-                schemata[int(vals[0])] = Schema(int(vals[0]), vals[1], size,event_size, data_types, axis_names, float(vals[5]), -1, "na")
+                index = int(vals[0])
+                schemata[index] = Schema(vals[1].decode("UTF-8"), size,event_size, data_types, axis_names, float(vals[5]), -1, "na")
             cursor = len(file_blob)
         elif self._Version == "1.1":
             for schema in variable_header:
-                vals = schema.split(":")
-                event_size = vals[2].strip()
-                axis_names = [axis.strip() for axis in vals[4].split(",")]
-                data_types = [data.strip() for data in vals[3].split(",")]
+                vals = schema.split(b":")
+                event_size = vals[2].strip().decode("UTF-8")
+                axis_names = [axis.strip() for axis in vals[4].decode("UTF-8").split(",")]
+                data_types = [data.strip() for data in vals[3].decode("UTF-8").split(",")]
                 size = [dt_get_udf_length(data) for data in data_types]
-                properties = vals[7].split(",")
-                schemata[int(vals[0])] = Schema(vals[1], size,event_size, data_types, axis_names, float(vals[5]), float(vals[6]), properties)
+                properties = vals[7].decode("UTF-8").split(",")
+                index = int(vals[0])
+                schemata[index] = Schema(vals[1].decode("UTF-8"), size,event_size, data_types, axis_names, float(vals[5]), float(vals[6]), properties)
             cursor = len(file_blob) + 6 # Skip the schema terminator
         else:
             print("Unsupported UDF Schema version")
@@ -96,11 +206,13 @@ class UDFDecoder:
         return schemata, cursor
     
 
-    def __values_from_byte_array(self, file_blob: bytearray, cursor: int, schemata: dict) -> tuple[list[str], list[str], dict]:
+    def __values_from_byte_array(self, file_blob: typing.Union[mmap.mmap, bytes], cursor: int, schemata: dict) -> tuple[np.ndarray, dict[int, str], dict]:
         """Read the body of a UDF File.
 
+        The body is read in two passes. The first pass walks the records to collect the timestamps, labels and the position of every event. The second pass decodes all events of a schema at once.
+
         Args:
-            file_blob (bytearray): A bytearray that is only the body of a binary file in the UDF format.
+            file_blob (typing.Union[mmap.mmap, bytes]): A read only memory map of the binary file in the UDF format, or empty bytes for an empty file.
             cursor (int): A int that is the index of the first byte of the body in the binary file.
             schemata (list[Schema]): A list of schemata which were defined by the header of the binary file
 
@@ -108,54 +220,95 @@ class UDFDecoder:
             Exception: If the file_blob is unreadable
 
         Returns:
-            tuple[list[str], list[str], list[Schema]]: A list of the timeStamps that are in the body, a list of the labels that are in the body and A list of the schemata which were defined in the header and have values in the body. Schemata without any data in the body are deleted.
+            tuple[np.ndarray, dict[int, str], list[Schema]]: A uint64 array of the timeStamps that are in the body, a dict of the labels that are in the body by the index of their timestamp and A list of the schemata which were defined in the header and have values in the body. Schemata without any data in the body are deleted.
         """
 
-        timestamps = []
-        labels = []
-        while cursor < len(file_blob):
-            if file_blob[cursor] == 0xF0 or file_blob[cursor] == 0xF1:
-                cursor += 1
-                timestamp_bytes = file_blob[cursor:cursor + 8]
-                timestamps.append(str(struct.unpack("<Q", timestamp_bytes)[0])) #unsigned 64bit
-                labels.append(None)
-                cursor += 8
-            elif file_blob[cursor] == 0xF8:
-                cursor += 1
-                label_bytes = file_blob[cursor:cursor + 16]
-                labels[len(labels)] = (struct.unpack("<s", label_bytes)[0])
-                cursor += 8
-            elif cursor < len(file_blob) and file_blob[cursor] in schemata.keys():
-                current_schema = schemata.get(file_blob[cursor])
-                size_bytes = current_schema.get_size_in_bytes()
-                data_type = current_schema.get_data_type()
-                schemata_index = file_blob[cursor]
-                cursor += 1
-                for idx, x in enumerate(size_bytes):
-                    value_bytes = file_blob[cursor : (cursor + x)]
-                    if len(value_bytes) != x:
-                        print("Size mismatch")
-                        break
-                    if x == 3: # Hack for u24 datatypes
-                        vb_ba = bytearray(value_bytes)
-                        vb_ba.append(0) # Add an MSB
-                        value_bytes = bytes(vb_ba)
-                    # if x == 16 and '\x00' in value_bytes: # Hack for s/st datatypes
-                    #     pos = value_bytes.find('\x00')
-                    #     value_bytes = file_blob[cursor : (cursor + pos)]
-                    #     x = pos
-                    value = struct.unpack(dt_get_structlib_type(data_type[idx]), value_bytes)
-                    schemata[schemata_index].add_value(idx,value[0])
-                    schemata[schemata_index].add_timestamp_index(idx,len(timestamps) - 1)
-                    cursor += x
-            else:
+        buffer = np.frombuffer(file_blob, dtype=np.uint8)
+        record_kinds = np.full(256, RECORD_INVALID, dtype=np.uint8)
+        record_sizes = np.zeros(256, dtype=np.int64)
+        for k, v in schemata.items():
+            record_kinds[k] = RECORD_EVENT
+            record_sizes[k] = 1 + v.get_record_dtype().itemsize
+        record_kinds[[0xF0, 0xF1]] = RECORD_TIMESTAMP
+        record_kinds[0xF8] = RECORD_LABEL
+        record_sizes[[0xF0, 0xF1]] = 9
+        record_sizes[0xF8] = 17
+
+        # The first walk only counts the records, so the outputs of the second walk have their exact size
+        no_offsets = np.empty(0, dtype=np.int64)
+        no_indices = np.empty(0, dtype=np.uint8)
+        _, timestamp_count, label_count, event_count = self.__scan_body(buffer, cursor, record_kinds, record_sizes, True, no_offsets, no_offsets, no_offsets, no_indices, no_offsets)
+        timestamp_offsets = np.empty(timestamp_count, dtype=np.int64)
+        label_offsets = np.empty(label_count, dtype=np.int64)
+        event_offsets = np.empty(event_count, dtype=np.int64)
+        event_indices = np.empty(event_count, dtype=np.uint8)
+        event_timestamp_indices = np.empty(event_count, dtype=np.int64)
+        cursor, timestamp_count, label_count, event_count = self.__scan_body(buffer, cursor, record_kinds, record_sizes, False, timestamp_offsets, label_offsets, event_offsets, event_indices, event_timestamp_indices)
+        if cursor < len(file_blob):
+            if record_kinds[file_blob[cursor]] == RECORD_INVALID:
                 raise Exception("Can't read Values from file. File may not be readable!")
-            
+            print("Size mismatch") # the last record was cut off
+
+        if timestamp_count > 0:
+            timestamps = sliding_window_view(buffer, 8)[timestamp_offsets].view("<u8").reshape(-1) #unsigned 64bit
+        else: # the window of a timestamp may not fit into a file without any
+            timestamps = np.empty(0, dtype=np.uint64)
+        label_timestamp_indices = np.searchsorted(timestamp_offsets, label_offsets) - 1 # a label belongs to the last timestamp before it
+        labels = {}
+        for time_stamp_index, offset in zip(label_timestamp_indices.tolist(), label_offsets.tolist()):
+            labels[time_stamp_index] = file_blob[offset:offset + 16].decode("UTF-8", errors="replace").rstrip("\x00")
+
+        event_order = np.argsort(event_indices, kind="stable") # groups the events by schema index and keeps their order within a schema
+        group_counts = np.bincount(event_indices, minlength=256)
+        group_ends = np.cumsum(group_counts)
+        for k, v in schemata.items():
+            if group_counts[k] == 0:
+                continue
+            group = event_order[group_ends[k] - group_counts[k]:group_ends[k]]
+            v.set_values(v.decode_events(buffer, event_offsets[group]), event_timestamp_indices[group])
+
         temp_schemata = {i:schemata[i] for i in schemata if schemata.get(i).get_amount_of_values() > 0}
 
         # self.__debug_message("Printing the first 10 values of every schema\n" + str([temp_schemata[k].get_values()[:10] for k in temp_schemata]))
         return timestamps, labels, temp_schemata
 
+    def __scan_body(self, buffer: np.ndarray, cursor: int, record_kinds: np.ndarray, record_sizes: np.ndarray, count_only: bool, *outputs: np.ndarray) -> tuple[int, int, int, int]:
+        """Walk the records of a UDF body with _scan_body.
+
+        Without numba, the arrays are passed as memoryviews, which the interpreter indexes a lot faster than numpy arrays since no numpy scalars are created.
+
+        Args:
+            buffer (np.ndarray): The binary file as an array of uint8.
+            cursor (int): The index of the first byte of the body.
+            record_kinds (np.ndarray): The kind of record (RECORD_*) that starts with a byte, indexed by that byte.
+            record_sizes (np.ndarray): The size of the record including its first byte, indexed by that byte.
+            count_only (bool): Only count the records, the outputs may be empty.
+            *outputs (np.ndarray): The timestamp, label and event outputs of _scan_body.
+
+        Returns:
+            tuple[int, int, int, int]: The cursor where the walk stopped and the amount of timestamps, labels and events.
+        """
+        scan_arrays = [buffer, record_kinds, record_sizes, *outputs]
+        if njit is None:
+            scan_arrays = [memoryview(scan_array) for scan_array in scan_arrays]
+        scan_buffer, scan_kinds, scan_sizes, *scan_outputs = scan_arrays
+        return _scan_body(scan_buffer, cursor, scan_kinds, scan_sizes, count_only, *scan_outputs)
+
+    def __convert_time(self, time_stamps: np.ndarray) -> np.ndarray:
+        """Convert the time_stamps from nanoseconds into the time_format of this object.
+
+        Args:
+            time_stamps (np.ndarray): A uint64 array of time_stamps in nanoseconds.
+
+        Returns:
+            np.ndarray: The time_stamps as uint64 in 'ns' or as float64 in any other time_format.
+        """
+        if self._TimeFormat == "ns":
+            return time_stamps
+        converted_time_stamps = time_stamps.astype(np.float64)
+        converted_time_stamps /= NANOSECONDS_PER_UNIT[self._TimeFormat]
+        return converted_time_stamps
+
     def __make_pyarrow_schema(self, schemata: dict) -> pa.Schema:
         """Create a pyarrow.schema object with data taken from a list of Schema objects and a time_format defined by a string.
 
@@ -171,102 +324,201 @@ class UDFDecoder:
         """
         data_fields = []
         for k,v in schemata.items() : 
-            temp_axis = enumerate(v.get_axis_name())
-            for id, value in temp_axis:
-                data_fields.append(pa.lib.field(v.get_name() + "." + value, dt_get_pyarrow_type(v.get_data_type()[id]),metadata={"scaling_factor": str(v.get_scaling_factor())}))
-
-        # if time_format == "ns":
-        data_fields.insert(0, pa.lib.field(f'Time in {self._TimeFormat}', pa.uint64(), metadata={"scaling_factor": "1.0"}))
-        # else:
-        #     data_fields.insert(0, pa.lib.field(f'Time in {self._TimeFormat}', pa.float64(), metadata={"scaling_factor": "1.0"}))
+            name = v.get_name()
+            data_types = v.get_data_type()
+            scaling_factor = str(v.get_scaling_factor())
+            for id, value in enumerate(v.get_axis_name()):
+                data_fields.append(_make_field(name + "." + value, data_types[id], scaling_factor))
+
+        if self._TimeFormat == "ns":
+            data_fields.insert(0, pa.lib.field(f'Time in {self._TimeFormat}', pa.uint64(), metadata={"scaling_factor": "1.0"}))
+        else:
+            data_fields.insert(0, pa.lib.field(f'Time in {self._TimeFormat}', pa.float64(), metadata={"scaling_factor": "1.0"}))
         data_fields.insert(1, pa.lib.field('Labels', pa.string(), metadata={"scaling_factor": "1.0"}))
         return pa.schema(data_fields)
 
-    def __make_pyarrow_table(self, pyarrow_schema: pa.schema, schemata: dict, time_stamps: list, labels: list) -> pa.Table:
+    def __make_column(self, pyarrow_type: pa.DataType, length: int, values: np.ndarray, time_stamp_indices: np.ndarray) -> pa.Array:
+        """Create a pyarrow.array that holds the values of one axis at the rows of their timestamps.
+
+        The values are scattered into a dense numpy array and the rows without a value are marked in a validity bitmap, so that the pyarrow.array can be created directly from these buffers. A column with a value in every row has no validity bitmap.
+        Strings, like the sparse labels, are not made dense. Every row only holds the index of its string, which are taken from the strings of the column.
+
+        Args:
+            pyarrow_type (pa.DataType): The pyarrow type of the column.
+            length (int): The amount of rows of the column.
+            values (np.ndarray): The values of one axis.
+            time_stamp_indices (np.ndarray): The indices of the timestamps of the values.
+
+        Returns:
+            pa.Array: A pyarrow.array with one row per timestamp.
+        """
+        valid = np.zeros(length, dtype=bool)
+        valid[time_stamp_indices] = True
+        validity_bitmap = pa.py_buffer(np.packbits(valid, bitorder="little")) if not valid.all() else None
+        if pa.types.is_string(pyarrow_type):
+            value_indices = np.zeros(length, dtype=np.int32)
+            value_indices[time_stamp_indices] = np.arange(len(values), dtype=np.int32)
+            value_indices = pa.Array.from_buffers(pa.int32(), length, [validity_bitmap, pa.py_buffer(value_indices)])
+            return pa.array(values, type=pyarrow_type).take(value_indices)
+        column = np.zeros(length, dtype=values.dtype)
+        column[time_stamp_indices] = values
+        if pa.types.is_boolean(pyarrow_type): # pyarrow stores booleans as bits
+            column = np.packbits(column, bitorder="little")
+        return pa.Array.from_buffers(pyarrow_type, length, [validity_bitmap, pa.py_buffer(column)])
+
+    def __make_scaled_pyarrow_schema(self, pyarrow_schema: pa.schema) -> pa.Schema:
+        """Create the pyarrow.schema of a scaled pyarrow.table, in which every numeric column but the time is a float64.
+
+        Args:
+            pyarrow_schema (pa.schema): The PyArrow Schema of the unscaled values.
+
+        Returns:
+            pa.Schema: A pyarrow.schema object.
+        """
+        metadata = pyarrow_schema.metadata
+        metadata[b"Was Scaled"] = "True"
+        data_fields = [pyarrow_schema[0]]
+        for data_field in pyarrow_schema:
+            if data_field.name != f"Time in {self._TimeFormat}":
+                data_fields.append(data_field.with_type(pa.float64()) if _is_scalable(data_field.type) else data_field)
+        return pa.schema(data_fields).with_metadata(metadata)
+
+    def __make_column_sources(self, pyarrow_schema: pa.schema, schemata: dict, labels: dict, row_count: int) -> list[tuple[pa.DataType, np.ndarray, np.ndarray]]:
+        """Prepare the labels and the values of every axis to be cut into record batches.
+
+        The labels and the values of every schema are ordered by the row of their timestamp, so the values of one batch are a slice of them.
+
+        Args:
+            pyarrow_schema (pa.schema): The PyArrow Schema of the record batches.
+            schemata (dict): A Dict of Schema objects which all have values in their lists of values.
+            labels (dict): A dict of all labels in the binary file by the index of their timestamp.
+            row_count (int): The amount of rows, which is the amount of time_stamps.
+
+        Returns:
+            list[tuple[pa.DataType, np.ndarray, np.ndarray]]: The pyarrow type, the ordered values and their rows for the labels and every axis.
+        """
+        label_rows = np.fromiter(labels.keys(), dtype=np.int64, count=len(labels))
+        label_rows = np.where(label_rows < 0, label_rows + row_count, label_rows)
+        order = np.argsort(label_rows, kind="stable")
+        column_sources = [(pyarrow_schema.field(1).type, np.array(list(labels.values()), dtype=str)[order], label_rows[order])]
+        field_index = 2
+        for k,v in schemata.items():
+            rows = v.get_timestamp_indices()
+            rows = np.where(rows < 0, rows + row_count, rows) # Values before the first timestamp have the index -1, which is the last row
+            order = np.argsort(rows, kind="stable")
+            rows = rows[order]
+            for values in v.get_values():
+                column_sources.append((pyarrow_schema.field(field_index).type, values[order], rows))
+                field_index += 1
+        return column_sources
+
+    def __iter_record_batches(self, pyarrow_schema: pa.schema, schemata: dict, time_stamps: np.ndarray, labels: dict, batch_rows: int = BATCH_ROWS) -> typing.Iterator[pa.RecordBatch]:
+        """Create the pyarrow.record_batch objects of a pyarrow.table one after another, so that only one batch of dense columns exists at a time.
+
+        Args:
+            pyarrow_schema (pa.schema): A PyArrow Schema which correlates to the other parameters.
+            schemata (dict): A Dict of Schema objects which all have values in their lists of values.
+            time_stamps (np.ndarray): An array of all time_stamps of the binary file in the time_format.
+            labels (dict): A dict of all labels in the binary file by the index of their timestamp.
+            batch_rows (int): The maximum amount of rows of one batch. Defaults to BATCH_ROWS.
+
+        Yields:
+            pa.RecordBatch: The rows of the next batch_rows time_stamps.
+        """
+        row_count = len(time_stamps)
+        column_sources = self.__make_column_sources(pyarrow_schema, schemata, labels, row_count)
+        time_type = pyarrow_schema.field(0).type
+        make_column = self.__make_column
+
+        def make_batch_column(column_source: tuple[pa.DataType, np.ndarray, np.ndarray], start: int, stop: int) -> pa.Array:
+            pyarrow_type, values, rows = column_source
+            first, last = np.searchsorted(rows, (start, stop))
+            return make_column(pyarrow_type, stop - start, values[first:last], rows[first:last] - start)
+
+        # The columns of a batch are independent and numpy and pyarrow release the GIL while filling them.
+        # A single column or a file of less than one batch is built serially, the threads would cost more than they save
+        column_workers = min(len(column_sources), os.cpu_count() or 1)
+        executor = ThreadPoolExecutor(max_workers=column_workers) if column_workers > 1 and row_count >= BATCH_ROWS else None
+        map_columns = executor.map if executor is not None else map
+        try:
+            for start in range(0, row_count, batch_rows):
+                stop = min(start + batch_rows, row_count)
+                arrays = [pa.Array.from_buffers(time_type, stop - start, [None, pa.py_buffer(time_stamps[start:stop])])] # every row has a time_stamp
+                arrays.extend(map_columns(make_batch_column, column_sources, itertools.repeat(start), itertools.repeat(stop)))
+                yield pa.RecordBatch.from_arrays(arrays, schema=pyarrow_schema)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    def __scale_record_batches(self, record_batches: typing.Iterable[pa.RecordBatch], scaled_schema: pa.schema) -> typing.Iterator[pa.RecordBatch]:
+        """Scale every numeric column but the time of pyarrow.record_batch objects with the scaling factor in the metadata of its field.
+
+        The columns are scaled by the pyarrow.compute kernels, null values stay null.
+
+        Args:
+            record_batches (typing.Iterable[pa.RecordBatch]): Record batches with unscaled values.
+            scaled_schema (pa.schema): The PyArrow Schema of the scaled record batches.
+
+        Yields:
+            pa.RecordBatch: The next scaled record batch.
+        """
+        scales = [pa.scalar(float(field.metadata[b'scaling_factor'].decode("UTF-8")), pa.float64()) for field in scaled_schema]
+        for record_batch in record_batches:
+            arrays = [record_batch.column(0)]
+            for index in range(1, record_batch.num_columns):
+                column = record_batch.column(index)
+                arrays.append(pc.multiply(pc.cast(column, pa.float64(), safe=False), scales[index]) if _is_scalable(column.type) else column) # 64 bit integers above 2**53 are rounded like any float64
+            yield pa.RecordBatch.from_arrays(arrays, schema=scaled_schema)
+
+    def __make_pyarrow_table(self, pyarrow_schema: pa.schema, schemata: dict, time_stamps: np.ndarray, labels: dict) -> pa.Table:
         """Create a pyarrow.table object with data taken from a list of Schema objects and a list of time_stamps. The schema of the table is defined by a pyarrow.schema object.
 
         Args:
             pyarrow_schema (pa.schema): A PyArrow Schema which correlates to the other two parameters.
             schemata (list[Schema]): A list of Schema objects which all have values in their lists of values.
-            time_stamps (list): A list of all time_stamps of the binary file.
-            labels (list): A list of all labels in the binary file.
+            time_stamps (np.ndarray): An array of all time_stamps of the binary file in the time_format.
+            labels (dict): A dict of all labels in the binary file by the index of their timestamp.
 
         Returns:
             pa.Table: A pyarrow.table object created from the parameters.
         """
-        time_dict = []
-        value_dict = []
-
-        schemata_items = schemata.items()
-        for k,v in schemata_items:
-            for key,value in v.get_timestamp_indices().items():
-                time_dict.append(value)
-                value_dict.append(v.get_values()[key])
-
-        all_value_lists = [[None for time_stamp in time_stamps] for i in range(0, len(time_dict))] 
-        for all_value_lists_index, value_list in enumerate(all_value_lists):
-            for value_index, value in enumerate(value_dict[all_value_lists_index]): # get the values for one schema 
-                value_list[time_dict[all_value_lists_index][value_index]] = value 
-        all_value_lists.insert(0, time_stamps)
-        all_value_lists.insert(1, labels)
-        pyarrow_table = pa.Table.from_arrays(all_value_lists, schema=pyarrow_schema)
+        pyarrow_table = pa.Table.from_batches(self.__iter_record_batches(pyarrow_schema, schemata, time_stamps, labels), schema=pyarrow_schema)
 
         self.__debug_message("Printing the PyArrow table:\n" + str(pyarrow_table))
         return pyarrow_table
     
-    def __make_scaled_pyarrow_table(self, pyarrow_schema: pa.schema, schemata: dict, time_stamps: list, labels: list) -> pa.Table:
+    def __make_scaled_pyarrow_table(self, pyarrow_schema: pa.schema, schemata: dict, time_stamps: np.ndarray, labels: dict) -> pa.Table:
         """Create a pyarrow.table object with data taken from a list of Schema objects and a list of time_stamps. The schema of the table is defined by a pyarrow.schema object.
         The pyarrow.table is also scaled as per the schema of the table
 
         Args:
             pyarrow_schema (pa.schema): A PyArrow Schema which correlates to the other two parameters.
             schemata (dict): A Dict of Schema objects which all have values in their lists of values.
-            time_stamps (list): A list of all time_stamps of the binary file.
-            labels (list): A list of all labels in the binary file.
+            time_stamps (np.ndarray): An array of all time_stamps of the binary file in the time_format.
+            labels (dict): A dict of all labels in the binary file by the index of their timestamp.
 
         Returns:
             pa.Table: A pyarrow.table object created from the parameters.
         """
-        time_dict = []
-        value_dict = []
-
-        metadata = pyarrow_schema.metadata
-        metadata[b"Was Scaled"] = "True"
-        data_fields = [pyarrow_schema[0]]
-        for data_field in pyarrow_schema:
-            if data_field.name != f"Time in {self._TimeFormat}":
-                data_fields.append(data_field.with_type(pa.float64()))
-        pyarrow_schema = pa.schema(data_fields).with_metadata(metadata)
-
-        schemata_items = schemata.items()
-        for k,v in schemata_items:
-            for key,value in v.get_timestamp_indices().items():
-                time_dict.append(value)
-                value_dict.append(v.get_values()[key])
-
-        all_value_lists = [[None for time_stamp in time_stamps] for i in range(0, len(time_dict))] 
-        for all_value_lists_index, value_list in enumerate(all_value_lists):
-            scale = float(pyarrow_schema.field(all_value_lists_index+2).metadata[b'scaling_factor'].decode("UTF-8"))
-            for value_index, value in enumerate(value_dict[all_value_lists_index]): # get the values for one schema 
-                if value is not None:
-                    value_list[time_dict[all_value_lists_index][value_index]] = value * scale
-        all_value_lists.insert(0, time_stamps)
-        all_value_lists.insert(1, labels)
-        pyarrow_table = pa.Table.from_arrays(all_value_lists, schema=pyarrow_schema)
+        scaled_schema = self.__make_scaled_pyarrow_schema(pyarrow_schema)
+        record_batches = self.__iter_record_batches(pyarrow_schema, schemata, time_stamps, labels)
+        pyarrow_table = pa.Table.from_batches(self.__scale_record_batches(record_batches, scaled_schema), schema=scaled_schema)
 
         self.__debug_message("Printing the PyArrow table:\n" + str(pyarrow_table))
         return pyarrow_table
 
-    def read_bin_file(self, file_path,apply_scaling: bool) -> None:
-        """Read the binary file in the UDF Format that is given as a parameter.
+    def __read_body(self, file_path) -> tuple[dict, np.ndarray, dict]:
+        """Read the header and the body of the binary file in the UDF Format that is given as a parameter and create its PyArrow schema.
 
         Args:
             file_path (_type_): Path to file that should be read.
-            apply_scaling (bool): Should the values be scaled according to the scaling factors in the PyArrow schema of the PyArrow table
 
         Raises:
             FileNotFoundError: If the file was not found
             TypeError: If the filepath was not a string
+
+        Returns:
+            tuple[dict, np.ndarray, dict]: The schemata with values, the time_stamps and the labels of the file.
         """
         if type(file_path) == str:
             self._FilePath = pathlib.Path(file_path)
@@ -275,17 +527,30 @@ class UDFDecoder:
         else:
             raise TypeError(f"Argument FilePath in constructor must be a string. It is of type {type(file_path)}")
         with open(self._FilePath, 'rb') as f:
-            file_blob = f.read()
-
-        schemata, end_of_header = self.__header_from_byte_array(file_blob[:file_blob.find("\r\n\r\n".encode("UTF-8"))]) 
-
-        start_time = time.time()
-        time_stamps, labels, schemata = self.__values_from_byte_array(file_blob, end_of_header, schemata)
-        self.__debug_message("--- %s Prase Body Time (seconds) ---" % (time.time() - start_time))
-
-        start_time = time.time()
-        time_stamps = [np.uint64(time_stamp) for time_stamp in time_stamps]
-        self.__debug_message("--- %s TimeStamp in 'ns' Time (seconds) ---" % (time.time() - start_time))
+            if os.fstat(f.fileno()).st_size == 0: # An empty file can not be mapped
+                file_blob = b""
+            else:
+                if hasattr(os, "posix_fadvise"): # The body is read from front to back, let the OS read ahead
+                    os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+                file_blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                if hasattr(mmap, "MADV_SEQUENTIAL"):
+                    file_blob.madvise(mmap.MADV_SEQUENTIAL)
+        try:
+            schemata, end_of_header = self.__header_from_byte_array(file_blob[:file_blob.find("\r\n\r\n".encode("UTF-8"))]) 
+
+            start_time = time.time()
+            time_stamps, labels, schemata = self.__values_from_byte_array(file_blob, end_of_header, schemata)
+            self.__debug_message("--- %s Prase Body Time (seconds) ---" % (time.time() - start_time))
+
+            start_time = time.time()
+            time_stamps = self.__convert_time(time_stamps)
+            self.__debug_message(f"--- %s TimeStamp in '{self._TimeFormat}' Time (seconds) ---" % (time.time() - start_time))
+        finally:
+            try:
+                if isinstance(file_blob, mmap.mmap):
+                    file_blob.close()
+            except BufferError: # A traceback still references a view of the file, the mapping is released together with it
+                pass
 
         start_time = time.time()
         self._PyArrowSchema = self.__make_pyarrow_schema(schemata)
@@ -293,6 +558,20 @@ class UDFDecoder:
 
         was_scaled = {"Was Scaled": "False"}
         self._PyArrowSchema = self._PyArrowSchema.with_metadata(was_scaled)
+        return schemata, time_stamps, labels
+
+    def read_bin_file(self, file_path,apply_scaling: bool) -> None:
+        """Read the binary file in the UDF Format that is given as a parameter.
+
+        Args:
+            file_path (_type_): Path to file that should be read.
+            apply_scaling (bool): Should the values be scaled according to the scaling factors in the PyArrow schema of the PyArrow table
+
+        Raises:
+            FileNotFoundError: If the file was not found
+            TypeError: If the filepath was not a string
+        """
+        schemata, time_stamps, labels = self.__read_body(file_path)
 
         start_time = time.time()
         if apply_scaling :
@@ -302,6 +581,70 @@ class UDFDecoder:
             self._PyArrowTable = self.__make_pyarrow_table(self._PyArrowSchema, schemata, time_stamps, labels)
             self.__debug_message("--- %s Make Unscaled Table Time (seconds) ---" % (time.time() - start_time))
 
+    def convert_bin_file_to_parquet(self, file_path, apply_scaling: bool) -> None:
+        """Read the binary file in the UDF Format that is given as a parameter and write it into a .parquet file.
+
+        The rows are written one row group at a time while they are created, so the PyArrow table of the whole file is never held in memory.
+        get_arrow_table() can not be used after this function.
+
+        Args:
+            file_path (_type_): Path to file that should be read.
+            apply_scaling (bool): Should the values be scaled according to the scaling factors in the PyArrow schema of the PyArrow table
+
+        Raises:
+            FileNotFoundError: If the file was not found
+            TypeError: If the filepath was not a string
+        """
+        schemata, time_stamps, labels = self.__read_body(file_path)
+        self._PyArrowTable = None
+
+        start_time = time.time()
+        pyarrow_schema = self.__make_scaled_pyarrow_schema(self._PyArrowSchema) if apply_scaling else self._PyArrowSchema
+        record_batches = self.__iter_record_batches(self._PyArrowSchema, schemata, time_stamps, labels, PARQUET_ROW_GROUP_ROWS)
+        if apply_scaling:
+            record_batches = self.__scale_record_batches(record_batches, pyarrow_schema)
+        self._PyArrowSchema = pyarrow_schema # get_arrow_schema() returns the schema that was written
+        with self.__open_parquet_writer(pyarrow_schema) as writer:
+            for record_batch in record_batches:
+                writer.write_batch(record_batch, row_group_size=PARQUET_ROW_GROUP_ROWS)
+
+        self.__debug_message("--- %s Convert to Parquet File Time (seconds) ---" % (time.time() - start_time))
+        self.__debug_message("Wrote the record batches into a Parquet file")
+
+    @classmethod
+    def decode_file(cls, file_path: str, apply_scaling: bool) -> tuple[pyarrowTable, dict]:
+        """Read a binary file in the UDF Format without keeping any state.
+
+        Useful to decode several files in parallel, e.g. in a process pool.
+
+        Args:
+            file_path (str): Path to file that should be read.
+            apply_scaling (bool): Should the values be scaled according to the scaling factors in the PyArrow schema of the PyArrow table
+
+        Returns:
+            tuple[pyarrowTable, dict]: The PyArrow table and the metadata of its schema
+        """
+        udf_decoder = cls()
+        udf_decoder.read_bin_file(file_path, apply_scaling)
+        return udf_decoder.get_arrow_table(), udf_decoder.get_arrow_schema().metadata
+
+    @classmethod
+    def convert_file_to_parquet(cls, file_path: str, apply_scaling: bool) -> pathlib.Path:
+        """Convert a binary file in the UDF Format into a .parquet file next to it without keeping any state.
+
+        Useful to convert several files in parallel, e.g. in a process pool.
+
+        Args:
+            file_path (str): Path to file that should be converted.
+            apply_scaling (bool): Should the values be scaled according to the scaling factors in the PyArrow schema of the PyArrow table
+
+        Returns:
+            pathlib.Path: The path of the .parquet file
+        """
+        udf_decoder = cls()
+        udf_decoder.convert_bin_file_to_parquet(file_path, apply_scaling)
+        return udf_decoder._FilePath.with_suffix(".parquet")
+
     def get_arrow_schema(self) -> pyarrowSchema:
         """Return the PyArrow schema that was created by calling read_bin_file().
 
@@ -330,12 +673,50 @@ class UDFDecoder:
         else:
             raise Exception("File has to be read before getting the PyArrow Table")
 
-    def write_parquet_file(self):
+    @contextlib.contextmanager
+    def __open_parquet_writer(self, pyarrow_schema: pa.schema) -> typing.Iterator[pq.ParquetWriter]:
+        """Open a writer for the .parquet file next to the binary file.
+
+        The file is zstd compressed and floating point columns are stored byte stream split, which compresses sensor data a lot better.
+        The rows are written into a temporary file which only replaces the .parquet file once it was written completely, so no reader sees a partly written file and a failed write leaves no .parquet file behind.
+
+        Args:
+            pyarrow_schema (pa.schema): The PyArrow Schema of the data that will be written.
+
+        Yields:
+            pq.ParquetWriter: The opened writer.
+        """
+        parquet_file_path = self._FilePath.with_suffix(".parquet")
+        temporary_file_path = parquet_file_path.with_name(f"{parquet_file_path.name}.{uuid.uuid4().hex}.tmp")
+        float_columns = [field.name for field in pyarrow_schema if pa.types.is_floating(field.type)]
+        try:
+            with pq.ParquetWriter(temporary_file_path, pyarrow_schema, data_page_size=1 << 20,
+                                  compression="zstd", compression_level=3, use_dictionary=True, write_statistics=True, use_byte_stream_split=float_columns) as writer:
+                yield writer
+            os.replace(temporary_file_path, parquet_file_path)
+        finally:
+            temporary_file_path.unlink(missing_ok=True)
+
+    def write_parquet_file(self, apply_scaling: bool = False):
         """Write the PyArrow table that was created by calling read_bin_file() into a .parquet file.
 
+        Args:
+            apply_scaling (bool): Scale the values of an unscaled PyArrow table while it is written, one row group at a time, without creating a scaled copy of the whole table. Defaults to False.
         """
         start_time = time.time()
-        pq.write_table(self._PyArrowTable, self._FilePath.with_suffix(".parquet"))
+        pyarrow_table = self._PyArrowTable
+        pyarrow_schema = pyarrow_table.schema
+        apply_scaling = apply_scaling and pyarrow_schema.metadata[b"Was Scaled"] == b"False"
+        if apply_scaling:
+            pyarrow_schema = self.__make_scaled_pyarrow_schema(pyarrow_schema)
+        with self.__open_parquet_writer(pyarrow_schema) as writer:
+            if apply_scaling:
+                for offset in range(0, pyarrow_table.num_rows, PARQUET_ROW_GROUP_ROWS):
+                    row_group = pyarrow_table.slice(offset, PARQUET_ROW_GROUP_ROWS)
+                    row_group = pa.Table.from_batches(self.__scale_record_batches(row_group.to_batches(), pyarrow_schema), schema=pyarrow_schema)
+                    writer.write_table(row_group, row_group_size=PARQUET_ROW_GROUP_ROWS)
+            else:
+                writer.write_table(pyarrow_table, row_group_size=PARQUET_ROW_GROUP_ROWS)
 
         self.__debug_message("--- %s Write table to Parquet File Time (seconds) ---" % (time.time() - start_time))
         self.__debug_message("Wrote PyArrowTable into a Parquet file")
@@ -1,9 +1,15 @@
 from distutils.log import debug
 from fileinput import filename
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from flask import *
 import os
 import sys
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from werkzeug.utils import secure_filename
 from werkzeug.middleware.profiler import ProfilerMiddleware
 from pathlib import Path
@@ -32,6 +38,82 @@ app.secret_key = 'This is your secret key to utilize session in Flask'
 
 nameFile = ""
 
+# Amount of rows that are shown on one page of /show_data
+PREVIEW_ROWS = 1000
+
+# Decoding holds the GIL, so uploads are converted in worker processes to decode several files at once.
+# The pool is started on the first conversion and spawns its workers, since forking after pyarrow started its threads can deadlock
+executor = None
+executorLock = threading.Lock()
+
+def getExecutor():
+	global executor
+	with executorLock:
+		if executor is None:
+			executor = ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=multiprocessing.get_context("spawn"))
+		return executor
+
+# A pool whose worker died (killed for memory, crashed) is broken for good, the next conversion starts a new one
+def resetExecutor(brokenExecutor):
+	global executor
+	with executorLock:
+		if executor is brokenExecutor:
+			executor = None
+	brokenExecutor.shutdown(wait=False)
+
+def submitConversion(data_file_path):
+	conversionExecutor = getExecutor()
+	try:
+		return conversionExecutor, conversionExecutor.submit(UDFDecoder.UDFDecoder.convert_file_to_parquet, data_file_path, False)
+	except BrokenProcessPool:
+		resetExecutor(conversionExecutor)
+		conversionExecutor = getExecutor()
+		return conversionExecutor, conversionExecutor.submit(UDFDecoder.UDFDecoder.convert_file_to_parquet, data_file_path, False)
+
+# An upload is only decoded again if it changed. The .parquet file next to it is the cache, it only replaces the
+# old one once it was written completely. Requests for an upload that is being converted wait for the same conversion
+conversions = {}
+conversionsLock = threading.Lock()
+
+def decodeToParquet(data_file_path, modification_time):
+	parquetExtensionPath = Path(data_file_path).with_suffix('.parquet')
+	with conversionsLock:
+		if parquetExtensionPath.exists() and parquetExtensionPath.stat().st_mtime >= modification_time:
+			return parquetExtensionPath
+		conversion = conversions.get(data_file_path)
+		if conversion is None or conversion[0] != modification_time:
+			conversion = (modification_time, *submitConversion(data_file_path))
+			conversions[data_file_path] = conversion
+	try:
+		return conversion[2].result()
+	except BrokenProcessPool:
+		# The worker died during this conversion, it is not sent again at once in case the file killed it
+		resetExecutor(conversion[1])
+		raise
+	finally:
+		with conversionsLock:
+			if conversions.get(data_file_path) is conversion:
+				del conversions[data_file_path]
+
+# Only the row groups that hold the rows of the page are read from the .parquet file
+def readParquetPage(parquet_file, page):
+	first_row = page * PREVIEW_ROWS
+	rows_left = PREVIEW_ROWS
+	page_tables = []
+	for row_group in range(parquet_file.num_row_groups):
+		row_group_rows = parquet_file.metadata.row_group(row_group).num_rows
+		if first_row >= row_group_rows:
+			first_row -= row_group_rows
+			continue
+		page_tables.append(parquet_file.read_row_group(row_group).slice(first_row, rows_left))
+		rows_left -= page_tables[-1].num_rows
+		first_row = 0
+		if rows_left == 0:
+			break
+	if not page_tables:
+		return parquet_file.schema_arrow.empty_table()
+	return pa.concat_tables(page_tables)
+
 @app.route('/', methods=['GET', 'POST'])
 def uploadFile():
 	if request.method == 'POST':
@@ -59,20 +141,17 @@ def showData():
 	data_file_path = session.get('uploaded_data_file_path', None)
 	# read csv
 	
-	udf_decoder = UDFDecoder.UDFDecoder()
-	udf_decoder.read_bin_file(data_file_path,False)
-	udf_decoder.write_parquet_file()
-
-	parquetFilePath = Path(data_file_path) 
-	parquetExtensionPath = parquetFilePath.with_suffix('.parquet')
+	parquetExtensionPath = decodeToParquet(data_file_path, os.path.getmtime(data_file_path))
 
-	#uploaded_df = pd.read_parquet(parquetExtensionPath)
+	parquet_file = pq.ParquetFile(parquetExtensionPath)
+	page_count = max(-(-parquet_file.metadata.num_rows // PREVIEW_ROWS), 1)
+	page = min(max(request.args.get('page', 0, type=int), 0), page_count - 1)
 
-	# Converting to html Table
-	#uploaded_df_html = uploaded_df.to_html()
-	#return render_template('show_udf_data.html', data_var=uploaded_df_html, path_var = parquetExtensionPath)
-	return render_template('show_udf_data.html', path_var = (time.time() - start_time))
+	# Converting only the rows of one page to a html Table
+	uploaded_df_html = readParquetPage(parquet_file, page).to_pandas().to_html()
+	return render_template('show_udf_data.html', data_var=uploaded_df_html, path_var = (time.time() - start_time), page=page, page_count=page_count)
 
 
 if __name__ == '__main__':
+	multiprocessing.freeze_support()
 	app.run(debug=True)